@@ -1,4 +1,5 @@
 """Инициализация и настройка бота."""
+import asyncio
 import logging
 from aiogram import Bot, Dispatcher
 from aiogram.fsm.storage.redis import RedisStorage
@@ -100,5 +101,13 @@ class NumerologBot:
     async def stop(self):
         """Остановка бота."""
         logger.info("Остановка Telegram бота...")
-        await self.bot.session.close()
-        await self.redis.close()
+
+        # Сессия бота и Redis независимы - закрываем параллельно
+        results = await asyncio.gather(
+            self.bot.session.close(),
+            self.redis.close(),
+            return_exceptions=True
+        )
+        for name, result in zip(("bot session", "redis"), results):
+            if isinstance(result, Exception):
+                logger.error(f"Ошибка при закрытии {name}: {result}")
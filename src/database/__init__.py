@@ -1,6 +1,6 @@
 """Database package."""
 from database.database import DatabaseManager
-from database.models import Base, User, Order, OrderParticipant, Review, AiLog
+from database.models import Base, User, Order, OrderParticipant, Review, AiLog, NotificationOutbox
 
 __all__ = [
     "DatabaseManager",
@@ -10,4 +10,5 @@ __all__ = [
     "OrderParticipant",
     "Review",
     "AiLog",
+    "NotificationOutbox",
 ]
@@ -0,0 +1,19 @@
+"""Общие стратегии загрузки связей для запросов к заказам."""
+from sqlalchemy.orm import selectinload, raiseload
+
+from database.models import Order
+
+# Заказ с пользователем и участниками: selectinload (отдельный SELECT ... IN
+# без размножения строк JOIN'ом), остальные связи запрещены, чтобы случайная
+# ленивая загрузка не уходила в БД незаметно
+ORDER_LOADOPTS = (
+    selectinload(Order.user),
+    selectinload(Order.participants),
+    raiseload("*"),
+)
+
+# Заказ только с пользователем (когда участники не нужны)
+ORDER_USER_LOADOPTS = (
+    selectinload(Order.user),
+    raiseload("*"),
+)
@@ -142,3 +142,25 @@ class AiLog(Base):
 
     # Relationships
     order: Mapped["Order"] = relationship("Order", back_populates="ai_logs")
+
+
+class NotificationOutbox(Base):
+    """Модель исходящего уведомления пользователю (outbox)."""
+
+    __tablename__ = "notifications_outbox"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    order_id: Mapped[int | None] = mapped_column(Integer, ForeignKey("orders.id"))
+    telegram_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+
+    # Текст сообщения (HTML)
+    payload: Mapped[str] = mapped_column(Text, nullable=False)
+
+    # Доставка и повторы
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    next_retry_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+    sent_at: Mapped[datetime | None] = mapped_column(DateTime)
+    last_error: Mapped[str | None] = mapped_column(Text)
+
+    # Timestamp
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
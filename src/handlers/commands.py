@@ -154,6 +154,7 @@ async def download_handler(message: Message, session: AsyncSession):
     from database.models import Order
     from aiogram.types import FSInputFile
     from pathlib import Path
+    from services.pdf_generator import wait_pdf_saved
 
     # Получаем order_id из команды
     command_parts = message.text.split()
@@ -201,6 +202,9 @@ async def download_handler(message: Message, session: AsyncSession):
         )
         return
 
+    # Отчёт мог быть только что отправлен и ещё дописывается на диск
+    await wait_pdf_saved(order.order_uuid)
+
     if not order.pdf_url or not Path(order.pdf_url).exists():
         await message.answer(
             "❌ <b>Файл отчёта не найден</b>\n\n"
@@ -175,7 +175,7 @@ async def process_successful_payment(message: Message, session: AsyncSession):
 
     # TODO: Запустить генерацию AI отчёта
     from services.ai_service import start_ai_generation
-    await start_ai_generation(order.id, session, message.bot)
+    await start_ai_generation(order.id, session)
 
 
 @router.callback_query(F.data.startswith("pay_yookassa:"))
@@ -265,4 +265,4 @@ async def process_test_payment(callback: CallbackQuery, session: AsyncSession):
 
     # Запускаем генерацию AI отчёта
     from services.ai_service import start_ai_generation
-    await start_ai_generation(order.id, session, callback.bot)
+    await start_ai_generation(order.id, session)
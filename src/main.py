@@ -2,12 +2,6 @@
 import asyncio
 import logging
 
-import uvicorn
-from config import Config
-from database import DatabaseManager
-from bot import NumerologBot
-from api import create_app
-
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -17,6 +11,18 @@ logger = logging.getLogger(__name__)
 
 async def main():
     """Главная функция запуска приложения."""
+    # Приложение импортируется здесь, а не на уровне модуля: процессы пула
+    # рендеринга PDF (spawn) заново выполняют main.py как __mp_main__ и
+    # не должны загружать aiogram, FastAPI и SQLAlchemy
+    import uvicorn
+    from config import Config
+    from database import DatabaseManager
+    from bot import NumerologBot
+    from api import create_app
+    from services.notifications import run_outbox_worker
+    from services.ai_service import close_n8n_client
+    from services.pdf_generator import start_pdf_pool, shutdown_pdf_pool
+
     # Загрузка конфигурации
     config = Config()
     logger.info("Конфигурация загружена")
@@ -26,6 +32,9 @@ async def main():
     await db_manager.init_db()
     logger.info("База данных инициализирована")
 
+    # Запуск и прогрев процессов генерации PDF
+    start_pdf_pool()
+
     # Создание бота
     bot_instance = NumerologBot(config, db_manager)
 
@@ -46,12 +55,21 @@ async def main():
 
     async def run_bot():
         """Запуск бота."""
+        # Фоновая доставка уведомлений из outbox
+        outbox_task = asyncio.create_task(
+            run_outbox_worker(db_manager, bot_instance.bot)
+        )
+
         try:
             await bot_instance.start()
         except Exception as e:
             logger.error(f"Ошибка в боте: {e}")
         finally:
+            outbox_task.cancel()
+            await asyncio.gather(outbox_task, return_exceptions=True)
             await bot_instance.stop()
+            await close_n8n_client()
+            shutdown_pdf_pool()
             await db_manager.close()
 
     async def run_fastapi():
@@ -0,0 +1,166 @@
+"""
+Рендеринг PDF отчётов в процессах пула (WeasyPrint + Jinja2).
+
+Модуль выполняется в дочерних процессах services.pdf_generator, поэтому
+не импортирует ничего из приложения (aiogram, SQLAlchemy, FastAPI):
+каждый перезапуск процесса пула загружает только то, что нужно рендерингу.
+"""
+import functools
+import io
+import logging
+from pathlib import Path
+from typing import Any, Dict
+from jinja2 import (
+    Environment,
+    FileSystemLoader,
+    FileSystemBytecodeCache,
+    ModuleLoader,
+    Template,
+    select_autoescape
+)
+
+logger = logging.getLogger(__name__)
+
+# Директория с шаблонами
+TEMPLATES_DIR = Path("/app/templates")
+
+# Кеш скомпилированного байткода шаблонов (переживает перезапуск контейнера)
+JINJA_CACHE_DIR = Path("/app/.jinja_cache")
+
+# Шаблоны, предкомпилированные при сборке образа (tools/compile_templates.py)
+COMPILED_TEMPLATES_DIR = Path("/app/templates_compiled")
+
+
+def _use_compiled_templates() -> bool:
+    """
+    Проверка, можно ли загружать шаблоны из предкомпилированных модулей.
+
+    Шаблоны в /app/templates могут быть смонтированы с хоста и изменены
+    после сборки образа - тогда скомпилированные модули устарели.
+
+    Returns:
+        bool: True, если скомпилированные модули есть и новее исходников
+    """
+    try:
+        compiled_mtime = COMPILED_TEMPLATES_DIR.stat().st_mtime
+    except FileNotFoundError:
+        return False
+
+    return all(
+        source.stat().st_mtime <= compiled_mtime
+        for source in TEMPLATES_DIR.rglob("*")
+        if source.is_file()
+    )
+
+
+@functools.cache
+def _report_template() -> Template:
+    """
+    Шаблон отчёта (окружение Jinja2 создаётся один раз на процесс).
+
+    Настройки окружения не входят в ключ кеша байткода, поэтому при их
+    изменении нужно менять версию в имени файлов кеша и пересобирать образ
+    (те же настройки заданы в tools/compile_templates.py).
+
+    Returns:
+        Template: Шаблон report.html
+    """
+    if _use_compiled_templates():
+        loader = ModuleLoader(str(COMPILED_TEMPLATES_DIR))
+        bytecode_cache = None
+    else:
+        JINJA_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        loader = FileSystemLoader(str(TEMPLATES_DIR))
+        bytecode_cache = FileSystemBytecodeCache(str(JINJA_CACHE_DIR), "__jinja2_v2_%s.cache")
+
+    env = Environment(
+        loader=loader,
+        bytecode_cache=bytecode_cache,
+        auto_reload=False,
+        cache_size=50,
+        trim_blocks=True,
+        lstrip_blocks=True,
+        autoescape=select_autoescape(["html"]),
+        enable_async=False
+    )
+    return env.get_template("report.html")
+
+
+@functools.cache
+def _markdown():
+    """
+    Конвертер markdown → HTML (создаётся один раз при первом рендеринге).
+
+    Returns:
+        Callable[[str], str]: Функция конвертации mistune
+    """
+    import mistune
+
+    return mistune.create_markdown(
+        escape=False,      # HTML внутри markdown пропускаем как есть
+        hard_wrap=True,    # Переводы строк в <br>
+        plugins=["table", "strikethrough", "footnotes", "url"]
+    )
+
+
+@functools.cache
+def _weasyprint():
+    """
+    Ленивая загрузка WeasyPrint (Pango/cairo) только в процессах рендеринга.
+
+    Returns:
+        tuple: Класс HTML и общая конфигурация шрифтов
+            (поиск шрифтов - самая медленная часть WeasyPrint)
+    """
+    from weasyprint import HTML
+    from weasyprint.text.fonts import FontConfiguration
+
+    return HTML, FontConfiguration()
+
+
+def warm_up() -> None:
+    """
+    Прогрев WeasyPrint при старте процесса пула.
+
+    Пробный рендеринг заполняет кеши fontconfig, Pango и harfbuzz, чтобы
+    первый реальный заказ не платил за холодный старт.
+    """
+    try:
+        HTML, font_config = _weasyprint()
+        HTML(string="<p>.</p>").write_pdf(font_config=font_config)
+        _markdown()
+        _report_template()
+    except Exception as e:
+        logger.warning("Не удалось прогреть WeasyPrint: %s", e)
+
+
+def render(context: Dict[str, Any], content: str) -> bytes:
+    """
+    Синхронный рендеринг PDF (выполняется в пуле процессов).
+
+    Args:
+        context: Данные для шаблона (только простые типы, без ORM объектов)
+        content: Текст отчёта от AI в формате markdown
+
+    Returns:
+        bytes: Содержимое PDF файла
+    """
+    HTML, font_config = _weasyprint()
+
+    # Конвертируем content из markdown в HTML
+    html_content_body = _markdown()(content)
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Markdown конвертирован в HTML (длина: %s символов)", len(html_content_body))
+
+    # Рендерим HTML потоком в буфер с явной кодировкой UTF-8
+    # (без промежуточной строки со всем документом)
+    buffer = io.BytesIO()
+    _report_template().stream(content=html_content_body, **context).dump(buffer, encoding='utf-8')
+    buffer.seek(0)
+
+    # Создаем HTML объект с правильной кодировкой
+    html = HTML(file_obj=buffer, encoding='utf-8')
+
+    # Генерируем PDF в память (запись на диск делает async вызывающий код)
+    return html.write_pdf(font_config=font_config)
@@ -3,9 +3,9 @@ import logging
 from datetime import datetime
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from aiogram import Bot
 
-from database.models import Order, OrderParticipant, AiLog
+from database.models import Order, AiLog, NotificationOutbox
+from database.loaders import ORDER_LOADOPTS
 from utils.enums import OrderStatus, AiProvider, AiLogStatus
 from services.n8n_client import N8nClient
 from services.report_generator import start_report_generation
@@ -13,34 +13,64 @@ from config import Config
 
 logger = logging.getLogger(__name__)
 
+# Общий N8N клиент: HTTP соединения переиспользуются между заказами
+_n8n_client: N8nClient | None = None
 
-async def start_ai_generation(order_id: int, session: AsyncSession, bot: Bot):
+
+def get_n8n_client(config: Config) -> N8nClient:
+    """
+    Получение общего N8N клиента (создаётся при первом вызове).
+
+    Args:
+        config: Конфигурация приложения
+
+    Returns:
+        N8nClient: Клиент N8N
+    """
+    global _n8n_client
+
+    if _n8n_client is None:
+        _n8n_client = N8nClient(
+            webhook_url=config.N8N_WEBHOOK_URL,
+            callback_url=f"{config.WEBHOOK_DOMAIN}/webhook/n8n/result",
+            secret_token=config.N8N_SECRET_TOKEN
+        )
+
+    return _n8n_client
+
+
+async def close_n8n_client() -> None:
+    """Закрытие общего N8N клиента при остановке приложения."""
+    global _n8n_client
+
+    if _n8n_client is not None:
+        await _n8n_client.aclose()
+        _n8n_client = None
+
+
+async def start_ai_generation(order_id: int, session: AsyncSession):
     """
     Запуск генерации AI отчёта после оплаты (асинхронно через N8N).
 
     Args:
         order_id: ID заказа
         session: Сессия БД
-        bot: Экземпляр бота
+
+    Уведомления пользователю не отправляются напрямую, а записываются
+    в outbox и доставляются фоновым воркером (services.notifications).
     """
     try:
         # Получаем заказ с участниками и пользователем (eager loading)
-        from sqlalchemy.orm import selectinload
-
         result = await session.execute(
             select(Order)
-            .options(selectinload(Order.user))
+            .options(*ORDER_LOADOPTS)
             .where(Order.id == order_id)
         )
         order = result.scalar_one()
 
         # Сохраняем user для использования в exception handler
         user = order.user
-
-        result = await session.execute(
-            select(OrderParticipant).where(OrderParticipant.order_id == order_id)
-        )
-        participants = result.scalars().all()
+        participants = order.participants
 
         # Обновляем статус
         order.status = OrderStatus.PROCESSING
@@ -63,14 +93,7 @@ async def start_ai_generation(order_id: int, session: AsyncSession, bot: Bot):
         if not config.N8N_WEBHOOK_URL:
             raise Exception("N8N_WEBHOOK_URL не настроен в .env")
 
-        # Формируем callback URL для N8N
-        callback_url = f"{config.WEBHOOK_DOMAIN}/webhook/n8n/result"
-
-        n8n_client = N8nClient(
-            webhook_url=config.N8N_WEBHOOK_URL,
-            callback_url=callback_url,
-            secret_token=config.N8N_SECRET_TOKEN
-        )
+        n8n_client = get_n8n_client(config)
 
         # Создаём AI лог
         ai_log = AiLog(
@@ -91,19 +114,20 @@ async def start_ai_generation(order_id: int, session: AsyncSession, bot: Bot):
             participants=participants_data
         )
 
-        # Уведомляем пользователя что отчёт генерируется
-        await bot.send_message(
-            chat_id=user.telegram_id,
-            text=(
+        # Уведомляем пользователя что отчёт генерируется (через outbox)
+        session.add(NotificationOutbox(
+            order_id=order.id,
+            telegram_id=user.telegram_id,
+            payload=(
                 f"⏳ <b>Генерация отчёта началась</b>\n\n"
                 f"Заказ: <code>{order.order_uuid}</code>\n"
                 f"Тариф: {order.tariff.value}\n"
                 f"Стиль: {order.style.value}\n\n"
                 f"Отчёт будет готов через несколько минут.\n"
                 f"Мы отправим его автоматически! 🔮"
-            ),
-            parse_mode="HTML"
-        )
+            )
+        ))
+        await session.commit()
 
         logger.info(f"Генерация запущена для заказа {order.id}, ожидаем результат от N8N")
 
@@ -118,18 +142,18 @@ async def start_ai_generation(order_id: int, session: AsyncSession, bot: Bot):
             ai_log.status = AiLogStatus.FAILED
             ai_log.error_message = str(e)
 
-        await session.commit()
-
-        # Уведомляем пользователя
-        await bot.send_message(
-            chat_id=user.telegram_id,
-            text=(
+        # Уведомляем пользователя (сообщение сохраняется в той же транзакции)
+        session.add(NotificationOutbox(
+            order_id=order.id,
+            telegram_id=user.telegram_id,
+            payload=(
                 f"❌ <b>Ошибка при запуске генерации отчёта</b>\n\n"
                 f"Заказ: <code>{order.order_uuid}</code>\n\n"
                 f"Произошла ошибка: {str(e)}\n\n"
                 f"Свяжитесь с поддержкой для решения проблемы."
-            ),
-            parse_mode="HTML"
-        )
+            )
+        ))
+
+        await session.commit()
 
         # TODO: Автоматический возврат средств через ЮKassa API
@@ -1,6 +1,7 @@
 """N8N webhook клиент для генерации отчётов."""
 import logging
 import httpx
+import orjson
 from typing import Dict, Any
 
 logger = logging.getLogger(__name__)
@@ -24,6 +25,23 @@ class N8nClient:
         self.secret_token = secret_token
         self.timeout = timeout
 
+        # Долгоживущий HTTP клиент: соединения с N8N переиспользуются (keep-alive),
+        # при поддержке сервером запросы мультиплексируются через HTTP/2
+        self._client = httpx.AsyncClient(
+            http2=True,
+            headers={"Content-Type": "application/json"},
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=50,
+                max_keepalive_connections=20,
+                keepalive_expiry=60.0
+            )
+        )
+
+    async def aclose(self) -> None:
+        """Закрытие HTTP клиента и пула соединений."""
+        await self._client.aclose()
+
     async def start_generation(
         self,
         prompt: str,
@@ -56,37 +74,36 @@ class N8nClient:
         }
 
         logger.info(
-            f"Отправка запроса в N8N для заказа {order_id} "
-            f"(тариф: {tariff}, стиль: {style})"
-            f"url: {self.webhook_url}"
+            "Отправка запроса в N8N для заказа %s (тариф: %s, стиль: %s), url: %s",
+            order_id, tariff, style, self.webhook_url
         )
 
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    self.webhook_url,
-                    json=payload
-                )
+            # Сериализуем payload через orjson (промпты бывают большими)
+            response = await self._client.post(
+                self.webhook_url,
+                content=orjson.dumps(payload)
+            )
 
-                # Проверяем что N8N принял запрос
-                response.raise_for_status()
+            # Проверяем что N8N принял запрос
+            response.raise_for_status()
 
-                # Парсим ответ
-                result = response.json()
+            # Парсим ответ
+            result = orjson.loads(response.content)
 
-                # Логируем ответ от N8N
-                logger.info(f"N8N принял запрос для заказа {order_id}: {result}")
+            # Логируем ответ от N8N
+            logger.info("N8N принял запрос для заказа %s: %s", order_id, result)
 
-                # Проверяем что workflow запустился
-                if "message" in result and "started" in result["message"].lower():
-                    logger.info(f"N8N workflow запущен для заказа {order_id}")
-                else:
-                    logger.warning(
-                        f"Неожиданный ответ от N8N для заказа {order_id}: {result}"
-                    )
+            # Проверяем что workflow запустился
+            if "message" in result and "started" in result["message"].lower():
+                logger.info("N8N workflow запущен для заказа %s", order_id)
+            else:
+                logger.warning(
+                    "Неожиданный ответ от N8N для заказа %s: %s", order_id, result
+                )
 
         except httpx.TimeoutException:
-            logger.error(f"Таймаут при отправке запроса в N8N для заказа {order_id}")
+            logger.error("Таймаут при отправке запроса в N8N для заказа %s", order_id)
             raise Exception(
                 "Превышено время ожидания ответа от сервиса генерации. "
                 "Попробуйте позже."
@@ -94,8 +111,8 @@ class N8nClient:
 
         except httpx.HTTPStatusError as e:
             logger.error(
-                f"HTTP ошибка от N8N для заказа {order_id}: "
-                f"{e.response.status_code}"
+                "HTTP ошибка от N8N для заказа %s: %s",
+                order_id, e.response.status_code
             )
             raise Exception(
                 f"Ошибка сервиса генерации (HTTP {e.response.status_code}). "
@@ -103,5 +120,5 @@ class N8nClient:
             )
 
         except Exception as e:
-            logger.error(f"Ошибка при отправке запроса в N8N для заказа {order_id}: {e}")
+            logger.error("Ошибка при отправке запроса в N8N для заказа %s: %s", order_id, e)
             raise Exception(f"Произошла ошибка при запуске генерации: {str(e)}")
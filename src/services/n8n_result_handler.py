@@ -1,18 +1,75 @@
 """Обработчик результатов генерации от N8N."""
+import asyncio
 import logging
 from datetime import datetime
-from sqlalchemy import select
+from pathlib import Path
+from sqlalchemy import select, update, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from aiogram import Bot
-from aiogram.types import FSInputFile
+from aiogram.types import BufferedInputFile
 
-from database.models import Order, OrderParticipant, AiLog
+from database.models import Order, AiLog
+from database.loaders import ORDER_LOADOPTS, ORDER_USER_LOADOPTS
 from utils.enums import OrderStatus, AiLogStatus
-from services.pdf_generator import generate_pdf
+from services.pdf_generator import render_pdf, save_pdf, save_pdf_in_background, get_pdf_path
+from handlers.reviews import request_review
 
 logger = logging.getLogger(__name__)
 
 
+def _latest_ai_log_id(order_id: int):
+    """
+    Подзапрос с ID последнего AI лога заказа.
+
+    Args:
+        order_id: ID заказа
+
+    Returns:
+        ScalarSelect: Подзапрос для использования в WHERE
+    """
+    return (
+        select(func.max(AiLog.id))
+        .where(AiLog.order_id == order_id)
+        .scalar_subquery()
+    )
+
+
+async def _retry_save_pdf(
+    order_id: int,
+    pdf_path: Path,
+    pdf_bytes: bytes,
+    session: AsyncSession
+) -> None:
+    """
+    Повторная запись PDF на диск после неудачной фоновой записи.
+
+    Заказ уже закоммичен с pdf_url, поэтому при повторной ошибке ссылка
+    очищается, чтобы /download не ссылался на несуществующий файл.
+    Ошибка не пробрасывается: отчёт уже доставлен или доставляется.
+
+    Args:
+        order_id: ID заказа
+        pdf_path: Путь к PDF файлу
+        pdf_bytes: Содержимое PDF файла
+        session: Сессия БД
+    """
+    try:
+        await save_pdf(pdf_path, pdf_bytes)
+        return
+    except Exception as e:
+        logger.error("Повторная запись PDF для заказа %s не удалась: %s", order_id, e)
+
+    try:
+        await session.execute(
+            update(Order)
+            .where(Order.id == order_id)
+            .values(pdf_url=None)
+        )
+        await session.commit()
+    except Exception as e:
+        logger.error("Не удалось очистить pdf_url заказа %s: %s", order_id, e)
+
+
 async def handle_n8n_result(
     order_id: int,
     text: str,
@@ -29,88 +86,98 @@ async def handle_n8n_result(
         bot: Экземпляр бота
     """
     try:
-        # Получаем заказ с участниками и пользователем
-        from sqlalchemy.orm import selectinload
-
+        # Получаем заказ с участниками и пользователем (AI лог обновляется UPDATE)
         result = await session.execute(
             select(Order)
-            .options(selectinload(Order.user))
+            .options(*ORDER_LOADOPTS)
             .where(Order.id == order_id)
         )
         order = result.scalar_one_or_none()
 
         if not order:
-            logger.error(f"Заказ {order_id} не найден при обработке результата от N8N")
+            logger.error("Заказ %s не найден при обработке результата от N8N", order_id)
             return
 
         user = order.user
+        participants = order.participants
 
-        # Получаем участников
-        result = await session.execute(
-            select(OrderParticipant).where(OrderParticipant.order_id == order_id)
-        )
-        participants = result.scalars().all()
-
-        # Логируем статистику ответа
+        # Логируем статистику ответа (слова оцениваем по пробелам, без split)
         char_count = len(text)
-        word_count = len(text.split())
+        word_count = text.count(" ") + 1
         estimated_pages = char_count / 2800
 
         logger.info(
-            f"N8N отчёт получен для заказа {order_id}: "
-            f"{char_count} символов, {word_count} слов, ~{estimated_pages:.1f} страниц"
+            "N8N отчёт получен для заказа %s: %s символов, ~%s слов, ~%.1f страниц",
+            order_id, char_count, word_count, estimated_pages
         )
 
-        # Обновляем AI лог
-        result = await session.execute(
-            select(AiLog)
-            .where(AiLog.order_id == order_id)
-            .order_by(AiLog.id.desc())
-            .limit(1)
-        )
-        ai_log = result.scalar_one_or_none()
-
-        if ai_log:
-            ai_log.status = AiLogStatus.SUCCESS
-            await session.commit()
-
-        # Генерируем PDF
-        logger.info(f"Генерация PDF для заказа {order_id}")
-        pdf_path = await generate_pdf(
+        # Генерируем PDF в память
+        logger.info("Генерация PDF для заказа %s", order_id)
+        pdf_bytes = await render_pdf(
             order=order,
             participants=participants,
             content=text
         )
+        pdf_path = get_pdf_path(order)
+
+        # Сохраняем PDF на диск (для /download) в фоне, пока обновляется БД
+        save_task = save_pdf_in_background(order.order_uuid, pdf_path, pdf_bytes)
+
+        # Обновляем последний AI лог без загрузки в ORM
+        await session.execute(
+            update(AiLog)
+            .where(AiLog.id == _latest_ai_log_id(order_id))
+            .values(status=AiLogStatus.SUCCESS)
+        )
 
-        # Обновляем заказ
-        order.status = OrderStatus.COMPLETED
-        order.pdf_url = pdf_path
-        order.completed_at = datetime.utcnow()
+        # Обновляем заказ (в той же транзакции)
+        await session.execute(
+            update(Order)
+            .where(Order.id == order_id)
+            .values(
+                status=OrderStatus.COMPLETED,
+                pdf_url=str(pdf_path),
+                completed_at=datetime.utcnow()
+            )
+        )
+
+        # Коммит завершается до отправки: ошибка Telegram не должна оставить
+        # заказ в PROCESSING (и сессию с незавершённым коммитом)
         await session.commit()
 
-        # Отправляем PDF пользователю
-        await bot.send_document(
-            chat_id=user.telegram_id,
-            document=FSInputFile(pdf_path),
-            caption=(
-                f"✅ <b>Ваш нумерологический отчёт готов!</b>\n\n"
-                f"Заказ: <code>{order.order_uuid}</code>\n"
-                f"Тариф: {order.tariff.value}\n"
-                f"Стиль: {order.style.value}\n\n"
-                f"Приятного чтения! 🔮"
+        # Отправляем PDF пользователю прямо из памяти, параллельно с записью на диск
+        send_result, save_result = await asyncio.gather(
+            bot.send_document(
+                chat_id=user.telegram_id,
+                document=BufferedInputFile(pdf_bytes, filename=pdf_path.name),
+                caption=(
+                    f"✅ <b>Ваш нумерологический отчёт готов!</b>\n\n"
+                    f"Заказ: <code>{order.order_uuid}</code>\n"
+                    f"Тариф: {order.tariff.value}\n"
+                    f"Стиль: {order.style.value}\n\n"
+                    f"Приятного чтения! 🔮"
+                ),
+                parse_mode="HTML"
             ),
-            parse_mode="HTML"
+            save_task,
+            return_exceptions=True
         )
 
-        logger.info(f"Отчёт успешно отправлен для заказа {order_id}")
+        if isinstance(save_result, BaseException):
+            logger.error("Не удалось сохранить PDF для заказа %s: %s", order_id, save_result)
+            await _retry_save_pdf(order_id, pdf_path, pdf_bytes, session)
+
+        if isinstance(send_result, BaseException):
+            logger.error("Не удалось отправить PDF для заказа %s: %s", order_id, send_result)
+            raise send_result
 
         # Запланировать запрос отзыва через 1 час
-        from handlers.reviews import request_review
-        import asyncio
         asyncio.create_task(request_review(bot, order_id, user.telegram_id))
 
+        logger.info("Отчёт успешно отправлен для заказа %s", order_id)
+
     except Exception as e:
-        logger.error(f"Ошибка при обработке результата N8N для заказа {order_id}: {e}")
+        logger.error("Ошибка при обработке результата N8N для заказа %s: %s", order_id, e)
         raise
 
 
@@ -130,41 +197,37 @@ async def handle_n8n_error(
         bot: Экземпляр бота
     """
     try:
-        # Получаем заказ
-        from sqlalchemy.orm import selectinload
-
+        # Получаем заказ с пользователем
         result = await session.execute(
             select(Order)
-            .options(selectinload(Order.user))
+            .options(*ORDER_USER_LOADOPTS)
             .where(Order.id == order_id)
         )
         order = result.scalar_one_or_none()
 
         if not order:
-            logger.error(f"Заказ {order_id} не найден при обработке ошибки от N8N")
+            logger.error("Заказ %s не найден при обработке ошибки от N8N", order_id)
             return
 
         user = order.user
 
-        logger.error(f"N8N вернул ошибку для заказа {order_id}: {error_message}")
+        logger.error("N8N вернул ошибку для заказа %s: %s", order_id, error_message)
 
         # Обновляем статус заказа
-        order.status = OrderStatus.FAILED
-        await session.commit()
+        await session.execute(
+            update(Order)
+            .where(Order.id == order_id)
+            .values(status=OrderStatus.FAILED)
+        )
 
-        # Обновляем AI лог
-        result = await session.execute(
-            select(AiLog)
-            .where(AiLog.order_id == order_id)
-            .order_by(AiLog.id.desc())
-            .limit(1)
+        # Обновляем последний AI лог без загрузки в ORM
+        await session.execute(
+            update(AiLog)
+            .where(AiLog.id == _latest_ai_log_id(order_id))
+            .values(status=AiLogStatus.FAILED, error_message=error_message)
         )
-        ai_log = result.scalar_one_or_none()
 
-        if ai_log:
-            ai_log.status = AiLogStatus.FAILED
-            ai_log.error_message = error_message
-            await session.commit()
+        await session.commit()
 
         # Уведомляем пользователя
         await bot.send_message(
@@ -179,5 +242,5 @@ async def handle_n8n_error(
         )
 
     except Exception as e:
-        logger.error(f"Ошибка при обработке ошибки N8N для заказа {order_id}: {e}")
+        logger.error("Ошибка при обработке ошибки N8N для заказа %s: %s", order_id, e)
         raise
@@ -0,0 +1,215 @@
+"""Фоновая доставка уведомлений пользователям через outbox."""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, delete, and_, or_
+from aiogram import Bot
+
+from database import DatabaseManager
+from database.models import NotificationOutbox
+
+logger = logging.getLogger(__name__)
+
+# Интервал опроса outbox в секундах
+POLL_INTERVAL = 2
+
+# Количество сообщений, обрабатываемых за один проход
+BATCH_SIZE = 20
+
+# После стольких неудачных попыток сообщение больше не отправляется
+MAX_ATTEMPTS = 10
+
+# Максимальная задержка между попытками в секундах
+MAX_BACKOFF = 600
+
+# Сколько хранить доставленные и недоставленные сообщения и как часто их удалять (секунды)
+SENT_RETENTION = timedelta(days=7)
+PRUNE_INTERVAL = 3600
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    """
+    Экспоненциальная задержка перед следующей попыткой отправки.
+
+    Args:
+        attempts: Количество уже сделанных попыток
+
+    Returns:
+        timedelta: Задержка до следующей попытки
+    """
+    return timedelta(seconds=min(5 * 2 ** attempts, MAX_BACKOFF))
+
+
+async def _claim_batch(db_manager: DatabaseManager) -> list:
+    """
+    Захват пачки готовых к доставке уведомлений.
+
+    Попытка засчитывается и следующая попытка откладывается до отправки,
+    поэтому после коммита блокировки строк не нужны: другие воркеры их
+    не возьмут, а при падении процесса сообщение будет повторено позже.
+
+    Args:
+        db_manager: Менеджер базы данных
+
+    Returns:
+        list: Кортежи (id, order_id, telegram_id, payload, attempts)
+    """
+    async with db_manager.get_session() as session:
+        result = await session.execute(
+            select(NotificationOutbox)
+            .where(
+                NotificationOutbox.sent_at.is_(None),
+                NotificationOutbox.attempts < MAX_ATTEMPTS,
+                NotificationOutbox.next_retry_at <= datetime.utcnow()
+            )
+            .order_by(NotificationOutbox.id)
+            .limit(BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        )
+        messages = result.scalars().all()
+
+        claimed = []
+        for message in messages:
+            message.attempts += 1
+            message.next_retry_at = datetime.utcnow() + _retry_delay(message.attempts)
+            claimed.append((
+                message.id,
+                message.order_id,
+                message.telegram_id,
+                message.payload,
+                message.attempts
+            ))
+
+        await session.commit()
+        return claimed
+
+
+async def process_outbox(db_manager: DatabaseManager, bot: Bot) -> int:
+    """
+    Отправка одной пачки готовых к доставке уведомлений.
+
+    Сообщения отправляются вне транзакции: медленный ответ Telegram
+    не держит открытую транзакцию и блокировки строк.
+
+    Args:
+        db_manager: Менеджер базы данных
+        bot: Экземпляр бота
+
+    Returns:
+        int: Количество обработанных сообщений
+    """
+    claimed = await _claim_batch(db_manager)
+    if not claimed:
+        return 0
+
+    sent_ids = []
+    errors = {}
+
+    for message_id, order_id, telegram_id, payload, attempts in claimed:
+        try:
+            await bot.send_message(
+                chat_id=telegram_id,
+                text=payload,
+                parse_mode="HTML"
+            )
+            sent_ids.append(message_id)
+
+        except Exception as e:
+            errors[message_id] = str(e)
+
+            if attempts >= MAX_ATTEMPTS:
+                logger.error(
+                    f"Уведомление {message_id} для заказа {order_id} "
+                    f"не доставлено после {attempts} попыток: {e}"
+                )
+            else:
+                logger.warning(
+                    f"Ошибка отправки уведомления {message_id} "
+                    f"(попытка {attempts}): {e}"
+                )
+
+    # Фиксируем результат короткой отдельной транзакцией
+    async with db_manager.get_session() as session:
+        if sent_ids:
+            await session.execute(
+                update(NotificationOutbox)
+                .where(NotificationOutbox.id.in_(sent_ids))
+                .values(sent_at=datetime.utcnow(), last_error=None)
+            )
+
+        for message_id, error in errors.items():
+            await session.execute(
+                update(NotificationOutbox)
+                .where(NotificationOutbox.id == message_id)
+                .values(last_error=error)
+            )
+
+        await session.commit()
+
+    return len(claimed)
+
+
+async def prune_outbox(db_manager: DatabaseManager) -> int:
+    """
+    Удаление доставленных и окончательно недоставленных уведомлений.
+
+    Удаляются сообщения, доставленные раньше SENT_RETENTION, и сообщения,
+    исчерпавшие MAX_ATTEMPTS и созданные раньше SENT_RETENTION
+    (последняя ошибка до этого хранится в last_error).
+
+    Args:
+        db_manager: Менеджер базы данных
+
+    Returns:
+        int: Количество удалённых сообщений
+    """
+    cutoff = datetime.utcnow() - SENT_RETENTION
+
+    async with db_manager.get_session() as session:
+        result = await session.execute(
+            delete(NotificationOutbox)
+            .where(or_(
+                NotificationOutbox.sent_at < cutoff,
+                and_(
+                    NotificationOutbox.sent_at.is_(None),
+                    NotificationOutbox.attempts >= MAX_ATTEMPTS,
+                    NotificationOutbox.created_at < cutoff
+                )
+            ))
+        )
+        await session.commit()
+        return result.rowcount
+
+
+async def run_outbox_worker(db_manager: DatabaseManager, bot: Bot) -> None:
+    """
+    Бесконечный цикл доставки уведомлений из outbox.
+
+    Args:
+        db_manager: Менеджер базы данных
+        bot: Экземпляр бота
+    """
+    logger.info("Outbox worker запущен")
+    next_prune_at = 0.0
+
+    while True:
+        try:
+            processed = await process_outbox(db_manager, bot)
+
+            # Периодическая очистка доставленных сообщений
+            if time.monotonic() >= next_prune_at:
+                pruned = await prune_outbox(db_manager)
+                next_prune_at = time.monotonic() + PRUNE_INTERVAL
+                if pruned:
+                    logger.info(f"Удалено старых уведомлений из outbox: {pruned}")
+        except asyncio.CancelledError:
+            logger.info("Outbox worker остановлен")
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка в outbox worker: {e}")
+            processed = 0
+
+        # Если пачка заполнена целиком - сразу берём следующую
+        if processed < BATCH_SIZE:
+            await asyncio.sleep(POLL_INTERVAL)
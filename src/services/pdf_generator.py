@@ -1,11 +1,19 @@
 """Сервис для генерации PDF отчётов с использованием WeasyPrint."""
+import asyncio
+import contextlib
 import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
 from pathlib import Path
-from jinja2 import Environment, FileSystemLoader
-from weasyprint import HTML, CSS
-from weasyprint.text.fonts import FontConfiguration
-import markdown
+from typing import Dict
+from uuid import uuid4
+import aiofiles
+import aiofiles.os
+
+import pdf_render
 
 logger = logging.getLogger(__name__)
 
@@ -13,13 +21,142 @@ logger = logging.getLogger(__name__)
 PDF_DIR = Path("/app/pdfs")
 PDF_DIR.mkdir(parents=True, exist_ok=True)
 
-# Директория с шаблонами
-TEMPLATES_DIR = Path("/app/templates")
+# Незавершённые фоновые записи PDF на диск: order_uuid -> задача
+_PENDING_WRITES: Dict[str, asyncio.Task] = {}
 
+# Пул процессов для рендеринга PDF: WeasyPrint синхронный и нагружает CPU,
+# поэтому выполняем его вне event loop (отдельные процессы обходят GIL).
+# Процессы запускаются через spawn и выполняют только модуль pdf_render:
+# main.py импортирует приложение внутри main(), а не на уровне модуля
+_PDF_WORKERS = min(4, os.cpu_count() or 1)
 
-async def generate_pdf(order, participants, content: str) -> str:
+# Cairo/Pango со временем накапливают память, поэтому после
+# _PDF_POOL_MAX_RENDERS рендеров пул заменяется новым. max_tasks_per_child
+# не используется: в Python 3.11 ProcessPoolExecutor не всегда запускает
+# замену отработавшему процессу, и пул постепенно теряет процессы
+_PDF_MAX_TASKS = 50
+_PDF_POOL_MAX_RENDERS = _PDF_WORKERS * _PDF_MAX_TASKS
+
+# Максимальное время рендеринга одного PDF в секундах
+PDF_RENDER_TIMEOUT = 180
+
+# Пул создаётся лениво (не при импорте модуля) и пересоздаётся после
+# _PDF_POOL_MAX_RENDERS рендеров или при аварии процесса (BrokenProcessPool)
+_PDF_POOL: ProcessPoolExecutor | None = None
+_PDF_POOL_RENDERS = 0
+
+
+def _new_pdf_pool() -> ProcessPoolExecutor:
+    """
+    Создание пула процессов рендеринга PDF с прогревом всех процессов.
+
+    Returns:
+        ProcessPoolExecutor: Пул процессов
+    """
+    pool = ProcessPoolExecutor(
+        max_workers=_PDF_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=pdf_render.warm_up
+    )
+
+    # При spawn процессы создаются по требованию - по одной задаче на процесс
+    for _ in range(_PDF_WORKERS):
+        pool.submit(int)
+
+    return pool
+
+
+def _get_pdf_pool() -> ProcessPoolExecutor:
+    """
+    Получение пула процессов для очередного рендеринга.
+
+    Пул создаётся при первом вызове и заменяется новым, когда через него
+    прошло _PDF_POOL_MAX_RENDERS рендеров. Старый пул дорабатывает уже
+    принятые задачи и завершается в фоне.
+
+    Returns:
+        ProcessPoolExecutor: Пул процессов
+    """
+    global _PDF_POOL, _PDF_POOL_RENDERS
+
+    if _PDF_POOL is not None and _PDF_POOL_RENDERS >= _PDF_POOL_MAX_RENDERS:
+        logger.info("Пул рендеринга PDF отработал %s рендеров, заменяем новым", _PDF_POOL_RENDERS)
+        _PDF_POOL.shutdown(wait=False)
+        _PDF_POOL = None
+
+    if _PDF_POOL is None:
+        _PDF_POOL = _new_pdf_pool()
+        _PDF_POOL_RENDERS = 0
+
+    _PDF_POOL_RENDERS += 1
+    return _PDF_POOL
+
+
+def _reset_pdf_pool(failed: ProcessPoolExecutor, terminate: bool = False) -> None:
+    """
+    Сброс сломанного или зависшего пула, чтобы следующий вызов создал новый.
+
+    Args:
+        failed: Пул, в котором упал или завис процесс
+        terminate: Принудительно завершить процессы пула (при зависании)
     """
-    Генерация PDF отчёта с использованием WeasyPrint.
+    global _PDF_POOL
+
+    # Пул мог уже пересоздать параллельный рендеринг
+    if _PDF_POOL is failed:
+        _PDF_POOL = None
+
+    # Список процессов берём до shutdown: он очищает его
+    processes = list((getattr(failed, "_processes", None) or {}).values()) if terminate else []
+    failed.shutdown(wait=False, cancel_futures=True)
+
+    # Зависший процесс сам не завершится и держал бы Cairo/Pango в памяти
+    for process in processes:
+        process.terminate()
+
+
+# Значение для незаполненных данных участника
+_UNSET = "не указано"
+
+
+def _format_participant(p) -> Dict[str, str]:
+    """
+    Данные участника для шаблона отчёта.
+
+    Args:
+        p: Модель участника
+
+    Returns:
+        Dict[str, str]: Отформатированные данные участника
+    """
+    bd = p.birth_date
+    bt = p.birth_time
+    return {
+        "full_name": p.full_name,
+        "birth_date": f"{bd.day:02d}.{bd.month:02d}.{bd.year}",
+        "birth_time": f"{bt.hour:02d}:{bt.minute:02d}" if bt else _UNSET,
+        "birth_place": p.birth_place or _UNSET
+    }
+
+
+def get_pdf_path(order) -> Path:
+    """
+    Путь к PDF файлу отчёта для заказа.
+
+    Args:
+        order: Модель заказа
+
+    Returns:
+        Path: Путь к PDF файлу
+    """
+    return PDF_DIR / f"report_{order.order_uuid}.pdf"
+
+
+async def render_pdf(order, participants, content: str) -> bytes:
+    """
+    Рендеринг PDF отчёта в память с использованием WeasyPrint.
+
+    Рендеринг выполняется в отдельном процессе, чтобы не блокировать event loop.
 
     Args:
         order: Модель заказа
@@ -27,72 +164,144 @@ async def generate_pdf(order, participants, content: str) -> str:
         content: Текст отчёта от AI
 
     Returns:
-        str: Путь к сгенерированному PDF файлу
+        bytes: Содержимое PDF файла
     """
     try:
-        # Конвертируем markdown в HTML
-        md = markdown.Markdown(
-            extensions=[
-                'extra',           # Таблицы, атрибуты и др.
-                'nl2br',           # Переводы строк в <br>
-                'sane_lists',      # Улучшенная обработка списков
-                'codehilite',      # Подсветка кода
-                'fenced_code',     # Блоки кода с ```
-                'tables',          # Таблицы
-            ],
-            output_format='html5'
-        )
-
-        # Конвертируем content из markdown в HTML
-        html_content_body = md.convert(content)
-
-        logger.debug(f"Markdown конвертирован в HTML (длина: {len(html_content_body)} символов)")
-
-        # Настройка Jinja2
-        env = Environment(loader=FileSystemLoader(str(TEMPLATES_DIR)))
-        template = env.get_template("report.html")
-
-        # Данные для шаблона
+        now = datetime.now()
+
+        # Данные для шаблона (ORM объекты не передаём в другой процесс)
         context = {
             "order_uuid": order.order_uuid,
             "tariff": order.tariff.value,
             "style": order.style.value,
-            "participants": [
-                {
-                    "full_name": p.full_name,
-                    "birth_date": p.birth_date.strftime("%d.%m.%Y"),
-                    "birth_time": p.birth_time.strftime("%H:%M") if p.birth_time else "не указано",
-                    "birth_place": p.birth_place or "не указано"
-                }
-                for p in participants
-            ],
-            "content": html_content_body,  # HTML вместо markdown
-            "created_date": datetime.now().strftime("%d.%m.%Y"),
-            "created_time": datetime.now().strftime("%H:%M")
+            "participants": list(map(_format_participant, participants)),
+            "created_date": now.strftime("%d.%m.%Y"),
+            "created_time": now.strftime("%H:%M")
         }
 
-        # Рендерим HTML с явной кодировкой UTF-8
-        html_content = template.render(**context)
+        # Генерируем PDF в пуле процессов
+        loop = asyncio.get_running_loop()
+        for attempt in range(2):
+            pool = _get_pdf_pool()
+            try:
+                return await asyncio.wait_for(
+                    loop.run_in_executor(pool, pdf_render.render, context, content),
+                    timeout=PDF_RENDER_TIMEOUT
+                )
+            except TimeoutError:
+                # Рендеринг завис - процесс не вернётся в пул, заменяем пул
+                logger.error("Рендеринг PDF не завершился за %s сек", PDF_RENDER_TIMEOUT)
+                _reset_pdf_pool(pool, terminate=True)
+                raise
+            except BrokenProcessPool:
+                # Процесс пула упал (crash Cairo/Pango, OOM killer) - пул больше
+                # не принимает задачи. Пересоздаём его и повторяем один раз
+                _reset_pdf_pool(pool)
+                if attempt:
+                    raise
+                logger.warning("Пул рендеринга PDF сломан, пересоздаём и повторяем")
 
-        # Генерируем PDF с помощью WeasyPrint
-        pdf_filename = f"report_{order.order_uuid}.pdf"
-        pdf_path = PDF_DIR / pdf_filename
+    except Exception as e:
+        logger.error("Ошибка при генерации PDF: %s", e, exc_info=True)
+        raise
 
-        # Конфигурация шрифтов для WeasyPrint
-        font_config = FontConfiguration()
 
-        # Создаем HTML объект с правильной кодировкой
-        html = HTML(string=html_content, encoding='utf-8')
+async def save_pdf(pdf_path: Path | str, pdf_bytes: bytes) -> None:
+    """
+    Сохранение PDF на диск без блокировки event loop.
 
-        # Генерируем PDF с конфигурацией шрифтов
-        html.write_pdf(
-            str(pdf_path),
-            font_config=font_config
-        )
+    Файл пишется во временный файл в той же директории и затем атомарно
+    переименовывается, поэтому /download никогда не видит недописанный PDF.
 
-        logger.info(f"PDF сгенерирован: {pdf_path}")
-        return str(pdf_path)
+    Args:
+        pdf_path: Путь к PDF файлу
+        pdf_bytes: Содержимое PDF файла
+    """
+    pdf_path = Path(pdf_path)
+    # Та же файловая система, что и у pdf_path: os.replace без копирования.
+    # Уникальное имя: повторный callback N8N может писать тот же заказ параллельно
+    tmp_path = pdf_path.with_name(f".{pdf_path.name}.{uuid4().hex}.tmp")
 
-    except Exception as e:
-        logger.error(f"Ошибка при генерации PDF: {e}", exc_info=True)
+    try:
+        async with aiofiles.open(tmp_path, "wb") as f:
+            await f.write(pdf_bytes)
+        await aiofiles.os.replace(tmp_path, pdf_path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            tmp_path.unlink()
         raise
+
+    logger.info("PDF сохранён: %s", pdf_path)
+
+
+def save_pdf_in_background(order_uuid: str, pdf_path: Path | str, pdf_bytes: bytes) -> asyncio.Task:
+    """
+    Запуск записи PDF на диск в фоне.
+
+    Пока запись не завершена, её можно дождаться через wait_pdf_saved.
+
+    Args:
+        order_uuid: UUID заказа
+        pdf_path: Путь к PDF файлу
+        pdf_bytes: Содержимое PDF файла
+
+    Returns:
+        asyncio.Task: Задача записи
+    """
+    task = asyncio.create_task(save_pdf(pdf_path, pdf_bytes))
+    _PENDING_WRITES[order_uuid] = task
+
+    def _forget(done: asyncio.Task) -> None:
+        if _PENDING_WRITES.get(order_uuid) is done:
+            del _PENDING_WRITES[order_uuid]
+
+    task.add_done_callback(_forget)
+    return task
+
+
+async def wait_pdf_saved(order_uuid: str) -> None:
+    """
+    Ожидание завершения фоновой записи PDF заказа (если она ещё идёт).
+
+    Args:
+        order_uuid: UUID заказа
+    """
+    task = _PENDING_WRITES.get(order_uuid)
+    if task is not None:
+        # asyncio.wait не пробрасывает ошибку записи и не отменяет задачу
+        await asyncio.wait({task})
+
+
+async def generate_pdf(order, participants, content: str) -> str:
+    """
+    Генерация PDF отчёта и сохранение его на диск.
+
+    Args:
+        order: Модель заказа
+        participants: Список участников
+        content: Текст отчёта от AI
+
+    Returns:
+        str: Путь к сгенерированному PDF файлу
+    """
+    pdf_bytes = await render_pdf(order, participants, content)
+    pdf_path = get_pdf_path(order)
+    await save_pdf(pdf_path, pdf_bytes)
+    return str(pdf_path)
+
+
+def start_pdf_pool() -> None:
+    """Запуск процессов пула рендеринга PDF при старте приложения (с прогревом)."""
+    global _PDF_POOL
+
+    if _PDF_POOL is None:
+        _PDF_POOL = _new_pdf_pool()
+
+
+def shutdown_pdf_pool() -> None:
+    """Остановка пула процессов рендеринга PDF при завершении приложения."""
+    global _PDF_POOL
+
+    if _PDF_POOL is not None:
+        _PDF_POOL.shutdown(wait=False, cancel_futures=True)
+        _PDF_POOL = None
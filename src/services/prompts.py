@@ -1,6 +1,7 @@
 """Промпты для генерации нумерологических отчётов."""
 import logging
-from typing import List, Dict, Any
+from collections import OrderedDict
+from typing import List, Dict, Any, Tuple
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
@@ -146,6 +147,66 @@ FAMILY_SHAMANIC = """Ты шаман, видящий родовые связи 
 Проанализируй даты рождения всех членов семьи, имена, используй книгу по нумерологии из базы знаний. Подготовь мистическое откровение на 15-20 страниц о родовой карме - кармические связи семьи, духовные задачи рода, предупреждения для каждого члена семьи."""
 
 
+# =============================================================================
+# ВЫБОР ПРОМПТА ПО ТАРИФУ И СТИЛЮ
+# =============================================================================
+
+PROMPT_MAP = {
+    ('quick', 'analytical'): QUICK_ANALYTICAL,
+    ('quick', 'shamanic'): QUICK_SHAMANIC,
+    ('deep', 'analytical'): DEEP_ANALYTICAL,
+    ('deep', 'shamanic'): DEEP_SHAMANIC,
+    ('pair', 'analytical'): PAIR_ANALYTICAL,
+    ('pair', 'shamanic'): PAIR_SHAMANIC,
+    ('family', 'analytical'): FAMILY_ANALYTICAL,
+    ('family', 'shamanic'): FAMILY_SHAMANIC,
+}
+
+
+# =============================================================================
+# КЕШ ГОТОВЫХ ПРОМПТОВ
+# =============================================================================
+
+# Максимальное количество промптов в кеше (LRU)
+PROMPT_CACHE_SIZE = 1024
+
+# Заказы с большим числом участников не кешируем, чтобы ограничить память
+PROMPT_CACHE_MAX_PARTICIPANTS = 5
+
+_prompt_cache: "OrderedDict[Tuple, str]" = OrderedDict()
+
+
+def _prompt_cache_key(
+    tariff: str,
+    style: str,
+    participants: List[Dict[str, Any]]
+) -> Tuple:
+    """
+    Ключ кеша промпта: тариф, стиль и все данные участников по порядку.
+
+    Args:
+        tariff: Тип тарифа
+        style: Стиль отчёта
+        participants: Список участников с данными
+
+    Returns:
+        Tuple: Хешируемый ключ
+    """
+    return (
+        tariff,
+        style,
+        tuple(
+            (
+                p.get("full_name"),
+                p.get("birth_date"),
+                p.get("birth_time"),
+                p.get("birth_place"),
+            )
+            for p in participants
+        ),
+    )
+
+
 # =============================================================================
 # ФУНКЦИЯ ПОСТРОЕНИЯ ПРОМПТА
 # =============================================================================
@@ -154,6 +215,49 @@ def build_numerology_prompt(
     tariff: str,
     style: str,
     participants: List[Dict[str, Any]]
+) -> str:
+    """
+    Построение промпта для нумерологического анализа (с кешированием).
+
+    Повторные заказы с теми же данными (повторная оплата, дубликаты)
+    получают готовый промпт из LRU кеша.
+
+    Args:
+        tariff: Тип тарифа ('quick', 'deep', 'pair', 'family')
+        style: Стиль отчёта ('analytical', 'shamanic')
+        participants: Список участников с данными
+
+    Returns:
+        str: Промпт для AI
+
+    Raises:
+        ValueError: Если неверная комбинация тарифа/стиля
+    """
+    if len(participants) > PROMPT_CACHE_MAX_PARTICIPANTS:
+        return _build_numerology_prompt(tariff, style, participants)
+
+    key = _prompt_cache_key(tariff, style, participants)
+
+    prompt = _prompt_cache.get(key)
+    if prompt is not None:
+        _prompt_cache.move_to_end(key)
+        logger.debug("Промпт для %s/%s взят из кеша", tariff, style)
+        return prompt
+
+    logger.debug("Промпта для %s/%s нет в кеше", tariff, style)
+    prompt = _build_numerology_prompt(tariff, style, participants)
+
+    _prompt_cache[key] = prompt
+    if len(_prompt_cache) > PROMPT_CACHE_SIZE:
+        _prompt_cache.popitem(last=False)
+
+    return prompt
+
+
+def _build_numerology_prompt(
+    tariff: str,
+    style: str,
+    participants: List[Dict[str, Any]]
 ) -> str:
     """
     Построение промпта для нумерологического анализа.
@@ -170,18 +274,7 @@ def build_numerology_prompt(
         ValueError: Если неверная комбинация тарифа/стиля
     """
     # Выбор базового промпта
-    prompt_map = {
-        ('quick', 'analytical'): QUICK_ANALYTICAL,
-        ('quick', 'shamanic'): QUICK_SHAMANIC,
-        ('deep', 'analytical'): DEEP_ANALYTICAL,
-        ('deep', 'shamanic'): DEEP_SHAMANIC,
-        ('pair', 'analytical'): PAIR_ANALYTICAL,
-        ('pair', 'shamanic'): PAIR_SHAMANIC,
-        ('family', 'analytical'): FAMILY_ANALYTICAL,
-        ('family', 'shamanic'): FAMILY_SHAMANIC,
-    }
-
-    base_prompt = prompt_map.get((tariff, style))
+    base_prompt = PROMPT_MAP.get((tariff, style))
 
     if not base_prompt:
         raise ValueError(f"Unknown tariff/style combination: {tariff}/{style}")
@@ -203,10 +296,9 @@ def build_numerology_prompt(
 
     elif tariff == 'family':
         # Несколько участников
-        family_data = ""
-        for i, p in enumerate(participants, 1):
-            family_data += f"\nЧЛЕН СЕМЬИ {i}:\n"
-            family_data += format_participant_data(p)
-            family_data += "\n"
+        family_data = "".join(
+            f"\nЧЛЕН СЕМЬИ {i}:\n{format_participant_data(p)}\n"
+            for i, p in enumerate(participants, 1)
+        )
 
         return base_prompt.format(family_data=family_data)
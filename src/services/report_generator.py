@@ -36,7 +36,7 @@ async def start_report_generation(
     # Логируем промпт
     logger.info(
         f"Сгенерирован промпт для {tariff}/{style}, "
-        f"длина: {len(prompt)} символов (~{len(prompt.split())} слов)"
+        f"длина: {len(prompt)} символов (~{prompt.count(' ') + 1} слов)"
     )
 
     # Отправляем в N8N для генерации
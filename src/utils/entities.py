@@ -1,10 +1,20 @@
 from dataclasses import dataclass
 from datetime import datetime, date, time
 from typing import Optional, List
-from utils import *
+from utils.enums import (
+    TariffType,
+    StyleType,
+    OrderStatus,
+    Currency,
+    PaymentMethod,
+    ParticipantType,
+    Rating,
+    AiProvider,
+    AiLogStatus
+)
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Order:
     id: int
     order_uuid: str
@@ -23,7 +33,7 @@ class Order:
     completed_at: Optional[datetime]
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class OrderParticipant:
     id: int
     order_id: int
@@ -34,7 +44,7 @@ class OrderParticipant:
     participant_type: ParticipantType
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Review:
     id: int
     order_id: int
@@ -44,7 +54,7 @@ class Review:
     created_at: datetime
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class AiLog:
     id: int
     order_id: int
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Скрипт для предкомпиляции Jinja2 шаблонов PDF отчётов в Python модули.
+
+Запуск: python tools/compile_templates.py [директория_шаблонов] [директория_вывода]
+
+Скрипт:
+1. Компилирует все шаблоны из templates/ в .py модули
+2. Сохраняет их в /app/templates_compiled (загружаются через ModuleLoader)
+
+Запускается при сборке Docker образа. Во время работы шаблоны загружаются
+как обычные модули, без разбора и генерации кода.
+"""
+import sys
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+TEMPLATES_DIR = "/app/templates"
+COMPILED_DIR = "/app/templates_compiled"
+
+
+def compile_templates(templates_dir: str, compiled_dir: str) -> None:
+    """
+    Компиляция шаблонов в директорию с модулями.
+
+    Args:
+        templates_dir: Директория с исходными шаблонами
+        compiled_dir: Директория для скомпилированных модулей
+    """
+    # Настройки должны совпадать с окружением в src/pdf_render.py:
+    # trim_blocks/lstrip_blocks/autoescape влияют на сгенерированный код
+    env = Environment(
+        loader=FileSystemLoader(templates_dir),
+        trim_blocks=True,
+        lstrip_blocks=True,
+        autoescape=select_autoescape(["html"]),
+        enable_async=False
+    )
+
+    env.compile_templates(
+        compiled_dir,
+        zip=None,
+        log_function=print,
+        ignore_errors=False
+    )
+
+
+if __name__ == "__main__":
+    templates_dir = sys.argv[1] if len(sys.argv) > 1 else TEMPLATES_DIR
+    compiled_dir = sys.argv[2] if len(sys.argv) > 2 else COMPILED_DIR
+
+    compile_templates(templates_dir, compiled_dir)
+    print(f"✅ Шаблоны скомпилированы в {compiled_dir}")
@@ -95,16 +95,24 @@ async def setup_assistant(pdf_path: str):
 
     # Ожидаем индексацию
     print("⏳ Ожидаем завершения индексации...")
-    while True:
-        vs_status = await vector_stores_api.retrieve(vector_store.id)
-        if vs_status.status == "completed":
-            print(f"✅ Индексация завершена! Файлов в базе: {vs_status.file_counts.completed}")
-            break
-        elif vs_status.status == "failed":
-            print("❌ Ошибка индексации")
-            sys.exit(1)
-
-        await asyncio.sleep(2)
+    # Короткий первый интервал и экспоненциальный рост (максимум 5 секунд)
+    delay = 0.5
+    try:
+        async with asyncio.timeout(300):
+            while True:
+                vs_status = await vector_stores_api.retrieve(vector_store.id)
+                if vs_status.status == "completed":
+                    print(f"✅ Индексация завершена! Файлов в базе: {vs_status.file_counts.completed}")
+                    break
+                elif vs_status.status == "failed":
+                    print("❌ Ошибка индексации")
+                    sys.exit(1)
+
+                await asyncio.sleep(delay)
+                delay = min(delay * 1.7, 5.0)
+    except TimeoutError:
+        print("❌ Индексация не завершилась за 5 минут")
+        sys.exit(1)
 
     # Шаг 3: Создание Assistant
     print("🤖 Создаем Assistant...")